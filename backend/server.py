@@ -1,23 +1,31 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from bson import ObjectId
+from pymongo import ReturnDocument
+from gridfs.errors import NoFile
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_serializer, field_validator
+from typing import List, Optional, Tuple
 import uuid
-from datetime import datetime
-import ffmpeg
+from datetime import datetime, timedelta
 import base64
 import json
 import asyncio
-from PIL import Image
-import io
+import aiofiles
+import cv2
+import numpy as np
 import shutil
+import struct
+import subprocess
 import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import lru_cache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,8 +35,13 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# Create the main app without a prefix
-app = FastAPI()
+def music_bucket():
+    """GridFS bucket for uploaded music"""
+    # Built per use: a bucket created at import would bind the Motor client to whatever loop exists then
+    return AsyncIOMotorGridFSBucket(db)
+
+# Create the main app without a prefix; orjson encodes the base64 file fields and datetimes much faster than json
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -41,19 +54,57 @@ MUSIC_DIR = ROOT_DIR / "music"
 for dir_path in [UPLOAD_DIR, OUTPUT_DIR, MUSIC_DIR]:
     dir_path.mkdir(exist_ok=True)
 
+# Scratch space for render jobs; point VIDEO_WORK_DIR at a tmpfs such as /dev/shm to keep job I/O off disk
+WORK_DIR = Path(os.environ.get('VIDEO_WORK_DIR', tempfile.gettempdir()))
+WORK_DIR_PREFIX = "video-job-"
+STALE_WORK_DIR_SECONDS = 60 * 60
+# A project still marked processing after this long lost its render job, e.g. to a worker restart
+STALE_JOB_SECONDS = 60 * 60
+
+# Uploads are streamed in chunks of this size instead of being read whole
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Upload limits; anything larger is rejected with 413 before it is fully read
+MAX_IMAGES = 10
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_LOGO_BYTES = 5 * 1024 * 1024
+MAX_MUSIC_BYTES = 50 * 1024 * 1024
+MAX_REQUEST_BYTES = MAX_IMAGES * MAX_IMAGE_BYTES + 1024 * 1024  # plus room for multipart framing
+# Images and the logo live in the project document, which MongoDB caps at 16 MB; leave headroom for the other fields
+MAX_STORED_FILE_BYTES = 15 * 1024 * 1024
+
 # Define Models
 class VideoProject(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
-    images: List[str] = []  # base64 encoded images
+    images: List[bytes] = []  # raw image bytes, stored as BSON binary
     duration: int = 30  # seconds
-    music_file: Optional[str] = None
-    logo_file: Optional[str] = None
+    music_file: Optional[bytes] = None  # inline music from older projects
+    music_file_id: Optional[str] = None  # GridFS id of the uploaded music
+    logo_file: Optional[bytes] = None
     logo_opacity: float = 0.8
     resolution: str = "1080p"  # 720p or 1080p
     created_at: datetime = Field(default_factory=datetime.utcnow)
     video_url: Optional[str] = None
     status: str = "draft"  # draft, processing, completed, failed
+    processing_started_at: Optional[datetime] = None
+
+    @field_validator('images', 'logo_file', 'music_file', mode='before')
+    @classmethod
+    def decode_legacy_base64(cls, value):
+        """Accept documents written before files were stored as binary"""
+        if isinstance(value, str):
+            return base64.b64decode(value)
+        if isinstance(value, list):
+            return [base64.b64decode(item) if isinstance(item, str) else item for item in value]
+        return value
+
+    @field_serializer('images', 'logo_file', 'music_file', when_used='json-unless-none')
+    def encode_base64(self, value):
+        """Files are still sent to clients as base64 strings"""
+        if isinstance(value, list):
+            return [base64.b64encode(item).decode('utf-8') for item in value]
+        return base64.b64encode(value).decode('utf-8')
 
 class VideoProjectCreate(BaseModel):
     name: str
@@ -64,129 +115,318 @@ class VideoProjectCreate(BaseModel):
 class VideoGenerationRequest(BaseModel):
     project_id: str
 
-def create_ken_burns_effect(image_path: str, output_path: str, duration: float, zoom_start: float = 1.0, zoom_end: float = 1.2, pan_x: float = 0, pan_y: float = 0):
-    """Create Ken Burns effect for a single image"""
+FPS = 30
+TRANSITION_DURATION = 0.5  # seconds of crossfade between consecutive images
+
+# Each encode gets a fixed thread budget and jobs beyond the CPU count queue, so concurrent renders don't oversubscribe
+FFMPEG_THREADS_PER_JOB = 2
+encode_slots = asyncio.Semaphore(max(1, (os.cpu_count() or 1) // FFMPEG_THREADS_PER_JOB))
+# Streamed renders get a pool of their own: the client's download pace throttles ffmpeg, so a slow or
+# stalled client would otherwise hold a slot that queued background jobs are waiting on. A stream blocked
+# on its client leaves ffmpeg idle on the pipe, so the two pools don't oversubscribe the CPU for long
+stream_slots = asyncio.Semaphore(max(1, (os.cpu_count() or 1) // FFMPEG_THREADS_PER_JOB))
+
+@lru_cache(maxsize=1)
+def nvenc_available() -> bool:
+    """Check whether the local ffmpeg build can encode with NVENC on an NVIDIA GPU"""
+    if not shutil.which('nvidia-smi'):
+        return False
     try:
-        # Get image dimensions
-        with Image.open(image_path) as img:
-            width, height = img.size
-        
-        # Create vertical 9:16 aspect ratio (1080x1920 for 1080p)
-        target_width = 1080
-        target_height = 1920
-        
-        # Calculate zoom and pan effects
-        zoom_filter = f"scale={int(width*zoom_start)}:{int(height*zoom_start)}"
-        pan_filter = f"crop={target_width}:{target_height}:{pan_x}:{pan_y}"
-        
-        # Create FFmpeg command for Ken Burns effect
-        (
-            ffmpeg
-            .input(image_path, loop=1, t=duration)
-            .filter('scale', target_width, target_height)
-            .filter('zoompan', z=f'min(zoom+0.0015,1.5)', d=int(duration*30), x='iw/2-(iw/zoom/2)', y='ih/2-(ih/zoom/2)', s=f'{target_width}x{target_height}')
-            .output(output_path, vcodec='libx264', pix_fmt='yuv420p', r=30)
-            .overwrite_output()
-            .run(quiet=True)
-        )
-        return True
-    except Exception as e:
-        print(f"Error creating Ken Burns effect: {e}")
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
         return False
+    return 'h264_nvenc' in result.stdout
 
-def create_video_from_images(project: VideoProject, output_path: str):
-    """Create video from images with Ken Burns effects and transitions"""
-    try:
-        temp_dir = tempfile.mkdtemp()
-        video_clips = []
-        
-        # Process each image
-        for i, image_b64 in enumerate(project.images):
-            # Decode base64 image
-            image_data = base64.b64decode(image_b64)
-            image_path = os.path.join(temp_dir, f"image_{i}.jpg")
-            
-            with open(image_path, 'wb') as f:
-                f.write(image_data)
-            
-            # Create video clip with Ken Burns effect
-            clip_path = os.path.join(temp_dir, f"clip_{i}.mp4")
-            clip_duration = project.duration / len(project.images)
-            
-            # Vary zoom and pan for each image
-            zoom_start = 1.0 + (i * 0.1)
-            zoom_end = 1.2 + (i * 0.1)
-            pan_x = (i % 2) * 100  # Alternate pan direction
-            pan_y = (i % 3) * 50
-            
-            if create_ken_burns_effect(image_path, clip_path, clip_duration, zoom_start, zoom_end, pan_x, pan_y):
-                video_clips.append(clip_path)
-        
-        if not video_clips:
-            raise Exception("No video clips created")
-        
-        # Concatenate clips with fade transitions
-        inputs = [ffmpeg.input(clip) for clip in video_clips]
-        
-        if len(inputs) == 1:
-            # Single clip
-            stream = inputs[0]
-        else:
-            # Multiple clips with fade transitions
-            stream = inputs[0]
-            for i in range(1, len(inputs)):
-                stream = ffmpeg.filter([stream, inputs[i]], 'xfade', transition='fade', duration=0.5)
+def video_codec_args() -> dict:
+    """Video encoder options: NVENC when a GPU is available, libx264 otherwise"""
+    if nvenc_available():
+        return {'vcodec': 'h264_nvenc', 'preset': 'p4', 'tune': 'll'}
+    return {'vcodec': 'libx264', 'threads': FFMPEG_THREADS_PER_JOB}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers (SOF0-SOF15, excluding DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def read_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a PNG or JPEG header without decoding any pixels"""
+    if data[:8] == PNG_SIGNATURE and data[12:16] == b'IHDR' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    
+    if data[:2] == b'\xff\xd8':
+        i = 2
+        while i + 9 <= len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:
+                # Fill byte before a marker
+                i += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                # Standalone markers carry no length field
+                i += 2
+                continue
+            if marker in JPEG_SOF_MARKERS:
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    
+    return None
+
+def video_input_args() -> dict:
+    """Input options for still images: NVDEC decode when enabled and NVENC is available"""
+    # zoompan only runs on the CPU, so decoded frames are downloaded from the GPU before filtering
+    if os.environ.get('FFMPEG_HWACCEL_DECODE') == '1' and nvenc_available():
+        return {'hwaccel': 'cuda'}
+    return {}
+
+def ffmpeg_options(options: dict) -> List[str]:
+    """Turn an options dict into ffmpeg command-line flags"""
+    return [arg for key, value in options.items() for arg in (f'-{key}', str(value))]
+
+def ken_burns_filter(duration: float, zoom_start: float = 1.0, zoom_end: float = 1.2) -> str:
+    """Filter chain applying the Ken Burns zoom to a single still-image input"""
+    # Create vertical 9:16 aspect ratio (1080x1920 for 1080p)
+    target_width = 1080
+    target_height = 1920
+    
+    # Zoom linearly from zoom_start to zoom_end over the clip; `on` is the output frame number
+    frames = round(duration * FPS)
+    zoom_rate = (zoom_end - zoom_start) / max(frames - 1, 1)
+    
+    # zoompan emits `d` frames for the one decoded input frame, so the image is decoded only once
+    return (
+        f"scale={target_width}:{target_height},"
+        f"zoompan=z='min({zoom_start}+{zoom_rate:.6f}*on,{zoom_end})':d={frames}"
+        f":x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={target_width}x{target_height}:fps={FPS},"
+        "format=yuv420p"
+    )
+
+# How much of ffmpeg's stderr is kept for the log when a render fails
+STDERR_TAIL_BYTES = 4096
+
+async def run_ffmpeg(args, cwd: Optional[str] = None):
+    """Run an ffmpeg command line in a subprocess without blocking the event loop"""
+    async with encode_slots:
+        process = await asyncio.create_subprocess_exec(*args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+
+# Stands in for the output path in cached render arguments
+RENDER_OUTPUT = '{render_output}'
+
+@lru_cache(maxsize=64)
+def render_args(image_count: int, duration: int, has_logo: bool, has_music: bool) -> Tuple[str, ...]:
+    """Build the ffmpeg command line that renders a project of this shape"""
+    # Inputs use fixed names relative to the job's working directory, so the arguments
+    # can be reused for every project with the same shape
+    args = ['ffmpeg', '-y', '-filter_complex_threads', str(FFMPEG_THREADS_PER_JOB)]
+    for i in range(image_count):
+        args += [*ffmpeg_options(video_input_args()), '-i', f"image_{i}.jpg"]
+    if has_logo:
+        args += ['-i', "logo.png"]
+    if has_music:
+        args += ['-i', "music.mp3"]
+    
+    # Lengthen each clip by its share of the crossfades so the result still runs `duration` seconds
+    clip_duration = (duration + (image_count - 1) * TRANSITION_DURATION) / image_count
+    
+    # Build one Ken Burns branch per image
+    filters = []
+    for i in range(image_count):
+        # Vary the zoom for each image
+        zoom_start = 1.0 + (i * 0.1)
+        zoom_end = 1.2 + (i * 0.1)
+        filters.append(f"[{i}:v]{ken_burns_filter(clip_duration, zoom_start, zoom_end)}[clip{i}]")
+    
+    # Chain the branches with fade transitions; each fade starts TRANSITION_DURATION before the running end.
+    # The fades run on the image branches inside this one graph, so there are no intermediate clips
+    # to concatenate and every frame is encoded exactly once
+    video = "clip0"
+    for i in range(1, image_count):
+        offset = i * (clip_duration - TRANSITION_DURATION)
+        filters.append(f"[{video}][clip{i}]xfade=transition=fade:duration={TRANSITION_DURATION}:offset={offset:.3f}[fade{i}]")
+        video = f"fade{i}"
+    
+    # Overlay logo in bottom-right corner
+    if has_logo:
+        filters.append(f"[{video}][{image_count}:v]overlay=x=W-w-20:y=H-h-20:eval=init[logo]")
+        video = "logo"
+    
+    args += ['-filter_complex', ';'.join(filters), '-map', f"[{video}]"]
+    if has_music:
+        args += ['-map', f"{image_count + int(has_logo)}:a", '-acodec', 'aac']
+    args += ['-pix_fmt', 'yuv420p', *ffmpeg_options(video_codec_args()), RENDER_OUTPUT]
+    return tuple(args)
+
+async def write_file(path: str, data: bytes):
+    """Write bytes to a file without blocking the event loop"""
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(data)
+
+async def download_file(file_id: str, path: str):
+    """Copy a GridFS file to disk one chunk at a time"""
+    grid_out = await music_bucket().open_download_stream(ObjectId(file_id))
+    async with aiofiles.open(path, 'wb') as f:
+        while chunk := await grid_out.readchunk():
+            await f.write(chunk)
+
+@asynccontextmanager
+async def prepared_render(project: VideoProject):
+    """Write a project's inputs to a scratch directory and yield it with the render arguments"""
+    # The directory is removed on the way out, whether or not the render succeeds
+    with tempfile.TemporaryDirectory(prefix=WORK_DIR_PREFIX, dir=WORK_DIR) as temp_dir:
+        # Write the inputs concurrently without blocking the event loop
+        writes = [write_file(os.path.join(temp_dir, f"image_{i}.jpg"), image_data) for i, image_data in enumerate(project.images)]
         
         # Add logo overlay if provided
         if project.logo_file:
-            logo_data = base64.b64decode(project.logo_file)
-            logo_path = os.path.join(temp_dir, "logo.png")
-            with open(logo_path, 'wb') as f:
-                f.write(logo_data)
-            
-            # Overlay logo in bottom-right corner
-            stream = ffmpeg.overlay(stream, ffmpeg.input(logo_path), x='W-w-20', y='H-h-20', eval='init')
+            writes.append(write_file(os.path.join(temp_dir, "logo.png"), project.logo_file))
         
         # Add background music if provided
-        if project.music_file:
-            music_data = base64.b64decode(project.music_file)
-            music_path = os.path.join(temp_dir, "music.mp3")
-            with open(music_path, 'wb') as f:
-                f.write(music_data)
-            
-            audio = ffmpeg.input(music_path).audio
-            stream = ffmpeg.output(stream, audio, output_path, vcodec='libx264', acodec='aac', pix_fmt='yuv420p')
-        else:
-            stream = ffmpeg.output(stream, output_path, vcodec='libx264', pix_fmt='yuv420p')
+        has_music = bool(project.music_file_id or project.music_file)
+        if project.music_file_id:
+            writes.append(download_file(project.music_file_id, os.path.join(temp_dir, "music.mp3")))
+        elif project.music_file:
+            writes.append(write_file(os.path.join(temp_dir, "music.mp3"), project.music_file))
         
-        # Run FFmpeg
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        await asyncio.gather(*writes)
+        
+        # FFmpeg runs from the temp dir so the cached arguments resolve the input names
+        yield temp_dir, render_args(len(project.images), project.duration, bool(project.logo_file), has_music)
+
+async def create_video_from_images(project: VideoProject, output_path: str):
+    """Create video from images with Ken Burns effects and transitions in a single FFmpeg pass"""
+    try:
+        if not project.images:
+            raise Exception("No images to render")
+        
+        output_path = os.path.abspath(output_path)
+        async with prepared_render(project) as (temp_dir, args):
+            await run_ffmpeg([output_path if arg == RENDER_OUTPUT else arg for arg in args], cwd=temp_dir)
         
-        # Cleanup
-        shutil.rmtree(temp_dir)
         return True
         
+    except subprocess.CalledProcessError as e:
+        # Background jobs have no client to report to, so ffmpeg's own error output is all there is to go on
+        logger.error(f"ffmpeg exited with code {e.returncode} while rendering {project.id}: {e.stderr[-STDERR_TAIL_BYTES:].decode(errors='replace')}")
+        return False
     except Exception as e:
-        print(f"Error creating video: {e}")
+        logger.error(f"Error creating video for {project.id}: {e}")
         return False
 
+# Fragmented MP4 can be written to a pipe: the moov atom comes first and each keyframe starts a fragment
+STREAM_OUTPUT_ARGS = ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov', 'pipe:1']
+
+async def read_stderr_tail(stream: asyncio.StreamReader) -> bytes:
+    """Drain a subprocess's stderr to the end, keeping only its last STDERR_TAIL_BYTES"""
+    tail = b""
+    while chunk := await stream.read(UPLOAD_CHUNK_SIZE):
+        tail = (tail + chunk)[-STDERR_TAIL_BYTES:]
+    return tail
+
+async def stream_video_render(temp_dir: str, args: Tuple[str, ...], cleanup: AsyncExitStack):
+    """Run a prepared render and yield the MP4 bytes as ffmpeg writes them"""
+    # The inputs were prepared before the response started; this generator owns their cleanup
+    try:
+        args = [part for arg in args for part in (STREAM_OUTPUT_ARGS if arg == RENDER_OUTPUT else [arg])]
+        async with stream_slots:
+            process = await asyncio.create_subprocess_exec(*args, cwd=temp_dir, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            # stderr is drained alongside stdout so ffmpeg never stalls on a full pipe
+            stderr_tail = asyncio.create_task(read_stderr_tail(process.stderr))
+            try:
+                while chunk := await process.stdout.read(UPLOAD_CHUNK_SIZE):
+                    yield chunk
+                await process.wait()
+            finally:
+                # The client went away mid-stream; stop encoding for nobody
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                stderr = await stderr_tail
+        if process.returncode != 0:
+            logger.error(f"ffmpeg exited with code {process.returncode} while streaming: {stderr.decode(errors='replace')}")
+            # The status line is already sent, so aborting the response is the only way to tell the client the video is incomplete
+            raise subprocess.CalledProcessError(process.returncode, args, stderr=stderr)
+    finally:
+        await cleanup.aclose()
+
+MAX_IMAGE_DIMENSION = 1920
+# Accepted upload content types and the format their bytes must actually be in
+IMAGE_CONTENT_TYPES = {"image/jpeg": "image/jpeg", "image/jpg": "image/jpeg", "image/png": "image/png"}
+# libjpeg can decode directly at 1/8, 1/4 or 1/2 scale, skipping most of the IDCT work
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def stored_file_bytes(images: List[bytes], logo_file: Optional[bytes], music_file: Optional[bytes] = None) -> int:
+    """Total size of the file contents kept inline in a project document"""
+    return sum(len(image) for image in images) + len(logo_file or b"") + len(music_file or b"")
+
+def sniff_image_type(content: bytes) -> Optional[str]:
+    """Identify JPEG and PNG data by their magic bytes"""
+    if content[:3] == b'\xff\xd8\xff':
+        return "image/jpeg"
+    if content[:8] == PNG_SIGNATURE:
+        return "image/png"
+    return None
+
+def resize_image(content: bytes) -> bytes:
+    """Downscale an image to fit within 1920x1920, returning the original bytes if it already fits"""
+    flags = cv2.IMREAD_COLOR
+    size = read_image_size(content)
+    if size and max(size) <= MAX_IMAGE_DIMENSION:
+        # The header says it already fits, so there is nothing to decode
+        return content
+    if size:
+        # Decode at the smallest scale that still covers the target size
+        for factor, reduced_flags in REDUCED_DECODE_FLAGS:
+            if max(size) // factor >= MAX_IMAGE_DIMENSION:
+                flags = reduced_flags
+                break
+    
+    image = cv2.imdecode(np.frombuffer(content, np.uint8), flags)
+    if image is None:
+        raise ValueError("Could not decode image")
+    
+    height, width = image.shape[:2]
+    if max(width, height) <= MAX_IMAGE_DIMENSION and flags == cv2.IMREAD_COLOR:
+        return content
+    
+    scale = MAX_IMAGE_DIMENSION / max(width, height)
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return buffer.tobytes()
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an upload in chunks, rejecting it with 413 as soon as it exceeds max_bytes"""
+    content = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        if len(content) + len(chunk) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        content.extend(chunk)
+    return bytes(content)
+
 # API Routes
-@api_router.get("/")
+@api_router.api_route("/", methods=["GET", "HEAD"])
 async def root():
     return {"message": "Video Generator API"}
 
 @api_router.post("/projects", response_model=VideoProject)
 async def create_project(project_data: VideoProjectCreate):
     """Create a new video project"""
-    project = VideoProject(**project_data.dict())
-    await db.video_projects.insert_one(project.dict())
+    project = VideoProject(**project_data.model_dump())
+    await db.video_projects.insert_one(project.model_dump())
     return project
 
-@api_router.get("/projects", response_model=List[VideoProject])
-async def get_projects():
-    """Get all video projects"""
-    projects = await db.video_projects.find().to_list(1000)
-    return [VideoProject(**project) for project in projects]
+@api_router.get("/projects", response_model=None)
+async def get_projects(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200)) -> List[dict]:
+    """Get a page of video projects, without their image, logo and music contents"""
+    # The projection leaves only plain fields, so documents are returned as-is instead of round-tripping through VideoProject
+    cursor = db.video_projects.find({}, {"_id": 0, "images": 0, "logo_file": 0, "music_file": 0}).skip(skip).limit(limit)
+    return [project async for project in cursor]
 
 @api_router.get("/projects/{project_id}", response_model=VideoProject)
 async def get_project(project_id: str):
@@ -196,6 +436,14 @@ async def get_project(project_id: str):
         raise HTTPException(status_code=404, detail="Project not found")
     return VideoProject(**project)
 
+@api_router.get("/projects/{project_id}/status", response_model=None)
+async def get_project_status(project_id: str) -> dict:
+    """Get a project's generation status without its file contents, for polling"""
+    project = await db.video_projects.find_one({"id": project_id}, {"_id": 0, "id": 1, "status": 1, "video_url": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
 @api_router.post("/projects/{project_id}/upload-images")
 async def upload_images(project_id: str, files: List[UploadFile] = File(...)):
     """Upload images to a project"""
@@ -203,23 +451,29 @@ async def upload_images(project_id: str, files: List[UploadFile] = File(...)):
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Convert uploaded files to base64
+    if len(files) > MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMAGES} images are allowed")
+    
+    # Collect raw image bytes; Motor stores them as BSON binary
     images = []
     for file in files:
-        if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
+        if file.content_type not in IMAGE_CONTENT_TYPES:
             raise HTTPException(status_code=400, detail="Only JPEG and PNG files are allowed")
         
-        content = await file.read()
-        # Resize image if too large
-        with Image.open(io.BytesIO(content)) as img:
-            if img.width > 1920 or img.height > 1920:
-                img.thumbnail((1920, 1920), Image.Resampling.LANCZOS)
-                output = io.BytesIO()
-                img.save(output, format='JPEG', quality=85)
-                content = output.getvalue()
+        content = await read_upload(file, MAX_IMAGE_BYTES)
+        if sniff_image_type(content) != IMAGE_CONTENT_TYPES[file.content_type]:
+            raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid {file.content_type} file")
+        # Resize off the event loop; decoding and resampling are CPU-bound
+        try:
+            content = await asyncio.get_running_loop().run_in_executor(None, resize_image, content)
+        except ValueError:
+            # A valid header doesn't guarantee a decodable body, e.g. a truncated JPEG
+            raise HTTPException(status_code=400, detail=f"{file.filename} could not be decoded")
+
+        images.append(content)
         
-        b64_image = base64.b64encode(content).decode('utf-8')
-        images.append(b64_image)
+        if stored_file_bytes(images, project.get("logo_file"), project.get("music_file")) > MAX_STORED_FILE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Project files exceed the {MAX_STORED_FILE_BYTES // (1024 * 1024)} MB storage limit")
     
     # Update project with images
     await db.video_projects.update_one(
@@ -239,16 +493,27 @@ async def upload_logo(project_id: str, file: UploadFile = File(...)):
     if file.content_type not in ["image/png", "image/jpeg", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Only PNG and JPEG files are allowed for logo")
     
-    content = await file.read()
-    b64_logo = base64.b64encode(content).decode('utf-8')
+    content = await read_upload(file, MAX_LOGO_BYTES)
+    if sniff_image_type(content) is None:
+        raise HTTPException(status_code=400, detail="Logo is not a valid PNG or JPEG file")
+    
+    if stored_file_bytes(project.get("images", []), content, project.get("music_file")) > MAX_STORED_FILE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Project files exceed the {MAX_STORED_FILE_BYTES // (1024 * 1024)} MB storage limit")
     
     await db.video_projects.update_one(
         {"id": project_id},
-        {"$set": {"logo_file": b64_logo}}
+        {"$set": {"logo_file": content}}
     )
     
     return {"message": "Logo uploaded successfully"}
 
+async def delete_stored_file(file_id: str):
+    """Remove a file from GridFS, ignoring ones that are already gone"""
+    try:
+        await music_bucket().delete(ObjectId(file_id))
+    except NoFile:
+        pass
+
 @api_router.post("/projects/{project_id}/upload-music")
 async def upload_music(project_id: str, file: UploadFile = File(...)):
     """Upload background music to a project"""
@@ -259,19 +524,94 @@ async def upload_music(project_id: str, file: UploadFile = File(...)):
     if file.content_type not in ["audio/mpeg", "audio/mp3", "audio/wav"]:
         raise HTTPException(status_code=400, detail="Only MP3 and WAV files are allowed")
     
-    content = await file.read()
-    b64_music = base64.b64encode(content).decode('utf-8')
+    # Stream the upload into GridFS chunk by chunk rather than holding the whole file in memory
+    grid_in = music_bucket().open_upload_stream(
+        file.filename or "music",
+        metadata={"project_id": project_id, "content_type": file.content_type}
+    )
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_MUSIC_BYTES:
+            await grid_in.abort()
+            raise HTTPException(status_code=413, detail=f"Music exceeds the {MAX_MUSIC_BYTES // (1024 * 1024)} MB limit")
+        await grid_in.write(chunk)
+    await grid_in.close()
     
     await db.video_projects.update_one(
         {"id": project_id},
-        {"$set": {"music_file": b64_music}}
+        {"$set": {"music_file_id": str(grid_in._id)}, "$unset": {"music_file": ""}}
     )
     
+    # Replace any previously uploaded track
+    if project.get("music_file_id"):
+        await delete_stored_file(project["music_file_id"])
+    
     return {"message": "Music uploaded successfully"}
 
-@api_router.post("/projects/{project_id}/generate")
-async def generate_video(project_id: str):
-    """Generate video from project"""
+async def run_encode_job(project: VideoProject):
+    """Render a project's video in the background and record the outcome"""
+    output_filename = f"{project.id}_{project.resolution}.mp4"
+    output_path = OUTPUT_DIR / output_filename
+    
+    try:
+        success = await create_video_from_images(project, str(output_path))
+    except Exception as e:
+        print(f"Error in video generation job for {project.id}: {e}")
+        success = False
+    
+    if success:
+        # Update project with video URL
+        await db.video_projects.update_one(
+            {"id": project.id},
+            {"$set": {
+                "video_url": f"/api/videos/{output_filename}",
+                "status": "completed"
+            }}
+        )
+    else:
+        await db.video_projects.update_one(
+            {"id": project.id},
+            {"$set": {"status": "failed"}}
+        )
+
+@api_router.post("/projects/{project_id}/generate", status_code=202)
+async def generate_video(project_id: str, background_tasks: BackgroundTasks):
+    """Queue video generation; poll status_url until the status leaves processing"""
+    # Mark the project as processing and load it in one round trip; a job that has gone stale may be restarted
+    stale_cutoff = datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)
+    project_data = await db.video_projects.find_one_and_update(
+        {
+            "id": project_id,
+            "images.0": {"$exists": True},
+            "$or": [{"status": {"$ne": "processing"}}, {"processing_started_at": {"$lt": stale_cutoff}}]
+        },
+        {"$set": {"status": "processing", "processing_started_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not project_data:
+        # Only the error path needs a second lookup to tell the failures apart
+        existing = await db.video_projects.find_one({"id": project_id}, {"_id": 0, "status": 1, "images": {"$slice": 1}})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if not existing.get("images"):
+            raise HTTPException(status_code=400, detail="No images uploaded")
+        raise HTTPException(status_code=409, detail="Video generation already in progress")
+    
+    project = VideoProject(**project_data)
+    
+    # Encode after the response is sent; ffmpeg runs as a subprocess so the worker stays responsive
+    background_tasks.add_task(run_encode_job, project)
+    
+    return {
+        "message": "Video generation started",
+        "status": "processing",
+        "status_url": f"/api/projects/{project_id}/status"
+    }
+
+@api_router.get("/projects/{project_id}/stream")
+async def stream_video(project_id: str):
+    """Render a project and stream the video to the client while it is encoded"""
     project_data = await db.video_projects.find_one({"id": project_id})
     if not project_data:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -281,44 +621,20 @@ async def generate_video(project_id: str):
     if not project.images:
         raise HTTPException(status_code=400, detail="No images uploaded")
     
-    # Update status to processing
-    await db.video_projects.update_one(
-        {"id": project_id},
-        {"$set": {"status": "processing"}}
-    )
-    
-    # Generate video
-    output_filename = f"{project_id}_{project.resolution}.mp4"
-    output_path = OUTPUT_DIR / output_filename
-    
+    # Write the inputs before the response starts, while failures can still be reported with a status code
+    cleanup = AsyncExitStack()
     try:
-        success = create_video_from_images(project, str(output_path))
-        
-        if success:
-            # Update project with video URL
-            await db.video_projects.update_one(
-                {"id": project_id},
-                {"$set": {
-                    "video_url": f"/api/videos/{output_filename}",
-                    "status": "completed"
-                }}
-            )
-            return {"message": "Video generated successfully", "video_url": f"/api/videos/{output_filename}"}
-        else:
-            await db.video_projects.update_one(
-                {"id": project_id},
-                {"$set": {"status": "failed"}}
-            )
-            raise HTTPException(status_code=500, detail="Video generation failed")
-            
+        temp_dir, args = await cleanup.enter_async_context(prepared_render(project))
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Music file not found")
     except Exception as e:
-        await db.video_projects.update_one(
-            {"id": project_id},
-            {"$set": {"status": "failed"}}
-        )
-        raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
+        logger.error(f"Error preparing render for {project_id}: {e}")
+        raise HTTPException(status_code=500, detail="Could not prepare video render")
+    
+    # Nothing is written to OUTPUT_DIR; the encoder's stdout goes straight into the response
+    return StreamingResponse(stream_video_render(temp_dir, args, cleanup), media_type="video/mp4")
 
-@api_router.get("/videos/{filename}")
+@api_router.api_route("/videos/{filename}", methods=["GET", "HEAD"])
 async def get_video(filename: str):
     """Download generated video"""
     video_path = OUTPUT_DIR / filename
@@ -348,10 +664,13 @@ async def update_project_settings(project_id: str, duration: int = Form(...), lo
 @api_router.delete("/projects/{project_id}")
 async def delete_project(project_id: str):
     """Delete a project"""
-    result = await db.video_projects.delete_one({"id": project_id})
-    if result.deleted_count == 0:
+    project = await db.video_projects.find_one_and_delete({"id": project_id}, {"music_file_id": 1})
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
+    if project.get("music_file_id"):
+        await delete_stored_file(project["music_file_id"])
+    
     # Clean up video file if exists
     video_files = list(OUTPUT_DIR.glob(f"{project_id}_*.mp4"))
     for video_file in video_files:
@@ -359,9 +678,27 @@ async def delete_project(project_id: str):
     
     return {"message": "Project deleted successfully"}
 
+class RequestSizeLimitMiddleware:
+    """Reject requests whose declared body is larger than any endpoint accepts"""
+    # Plain ASGI rather than @app.middleware, so responses (video downloads and streams included)
+    # go straight to the server instead of being relayed through an extra memory stream
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > MAX_REQUEST_BYTES:
+                response = ORJSONResponse(status_code=413, content={"detail": "Request body too large"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(RequestSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -377,6 +714,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Every endpoint looks projects up by their string id; index it so lookups aren't collection scans
+    await db.video_projects.create_index("id", unique=True)
+
+@app.on_event("startup")
+async def fail_stale_jobs():
+    # Render jobs don't survive a restart, so projects left processing by a dead worker would otherwise never finish
+    stale_cutoff = datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)
+    await db.video_projects.update_many(
+        {"status": "processing", "$or": [
+            {"processing_started_at": {"$lt": stale_cutoff}},
+            {"processing_started_at": {"$exists": False}}
+        ]},
+        {"$set": {"status": "failed"}}
+    )
+
+@app.on_event("startup")
+async def warm_encoder_probe():
+    # Probe for NVENC on a worker thread now rather than blocking the event loop on the first render
+    await asyncio.get_running_loop().run_in_executor(None, nvenc_available)
+
+@app.on_event("startup")
+async def remove_stale_work_dirs():
+    # Job directories outlive their job only if the worker was killed mid-render
+    cutoff = time.time() - STALE_WORK_DIR_SECONDS
+    for path in WORK_DIR.glob(f"{WORK_DIR_PREFIX}*"):
+        try:
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -3,43 +3,74 @@
 Comprehensive Backend API Test - Full workflow test
 """
 
-import subprocess
 import json
-import base64
-import tempfile
-import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 import io
 
+# One pooled keep-alive session for every request in the run
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+@lru_cache(maxsize=16)
 def create_sample_image(width=800, height=600, color=(255, 0, 0)):
-    """Create a sample image for testing"""
+    """Create a sample image for testing (cached per size and color)"""
     img = Image.new('RGB', (width, height), color=color)
-    buffer = io.BytesIO()
-    img.save(buffer, format='JPEG')
-    return buffer.getvalue()
+    with io.BytesIO() as buffer:
+        img.save(buffer, format='JPEG')
+        return buffer.getvalue()
 
-def run_curl_command(method, url, data=None, files=None, timeout=30):
-    """Run curl command and return result"""
-    cmd = ['curl', '-s', '-m', str(timeout), '-X', method]
-    
-    if data:
-        cmd.extend(['-H', 'Content-Type: application/json', '-d', data])
-    
-    if files:
-        for field_name, file_path in files.items():
-            cmd.extend(['-F', f'{field_name}=@{file_path}'])
-    
-    cmd.append(url)
-    
+# Standard red/green/blue upload payloads, encoded once at import
+_SAMPLE_IMAGES = {c: create_sample_image(800, 600, c) for c in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]}
+
+def run_request(method, url, data=None, files=None, timeout=30):
+    """Send a request on the shared session and return result"""
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout+5)
-        return result.returncode == 0, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
+        response = SESSION.request(
+            method, url,
+            json=json.loads(data) if data else None,
+            files=files,
+            timeout=timeout
+        )
+        return True, response.text, ""
+    except requests.Timeout:
         return False, "", "Timeout"
     except Exception as e:
         return False, "", str(e)
 
+def download_size(url, timeout=30):
+    """Return the size of a download in bytes without buffering the body"""
+    try:
+        response = SESSION.head(url, timeout=timeout)
+        if response.status_code == 200 and 'Content-Length' in response.headers:
+            return int(response.headers['Content-Length'])
+        with SESSION.get(url, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                return 0
+            return sum(len(chunk) for chunk in response.iter_content(65536))
+    except requests.RequestException:
+        return 0
+
+def wait_for_generation(base_url, project_id, timeout=90, interval=2):
+    """Poll the project's status until background video generation finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        success, response, error = run_request('GET', f'{base_url}/projects/{project_id}/status')
+        if success:
+            try:
+                data = json.loads(response)
+                if data.get('status') != 'processing':
+                    return data
+            except json.JSONDecodeError:
+                pass
+        time.sleep(interval)
+    return None
+
 def test_full_video_workflow():
     """Test the complete video generation workflow"""
     print("🎬 Full Video Generation Workflow Test")
@@ -57,7 +88,7 @@ def test_full_video_workflow():
         "resolution": "720p"  # Lower resolution for faster processing
     })
     
-    success, response, error = run_curl_command('POST', f'{base_url}/projects', data=project_data)
+    success, response, error = run_request('POST', f'{base_url}/projects', data=project_data)
     if success:
         try:
             data = json.loads(response)
@@ -73,54 +104,26 @@ def test_full_video_workflow():
     # Step 2: Upload images
     print("\n2. Uploading test images...")
     
-    # Create temporary image files
-    temp_dir = tempfile.mkdtemp()
-    image_files = []
+    # Upload the in-memory sample images as multipart form data
+    files = [
+        ('files', (f'image_{i}.jpg', _SAMPLE_IMAGES[color], 'image/jpeg'))
+        for i, color in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)])
+    ]
+    success, response, error = run_request('POST', f'{base_url}/projects/{project_id}/upload-images', files=files)
     
-    try:
-        for i, color in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
-            image_data = create_sample_image(800, 600, color)
-            image_path = os.path.join(temp_dir, f'image_{i}.jpg')
-            with open(image_path, 'wb') as f:
-                f.write(image_data)
-            image_files.append(image_path)
-        
-        # Upload images using curl with multipart form data
-        cmd = [
-            'curl', '-s', '-m', '30', '-X', 'POST',
-            f'{base_url}/projects/{project_id}/upload-images'
-        ]
-        
-        for image_path in image_files:
-            cmd.extend(['-F', f'files=@{image_path}'])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=35)
-        
-        if result.returncode == 0:
-            try:
-                data = json.loads(result.stdout)
-                print(f"✅ Images uploaded: {data.get('message', 'Success')}")
-            except:
-                print(f"✅ Images uploaded (non-JSON response): {result.stdout}")
-        else:
-            print(f"❌ Image upload failed: {result.stdout}")
-            return False
-            
-    finally:
-        # Cleanup temp files
-        for file_path in image_files:
-            try:
-                os.unlink(file_path)
-            except:
-                pass
+    if success:
         try:
-            os.rmdir(temp_dir)
+            data = json.loads(response)
+            print(f"✅ Images uploaded: {data.get('message', 'Success')}")
         except:
-            pass
+            print(f"✅ Images uploaded (non-JSON response): {response}")
+    else:
+        print(f"❌ Image upload failed: {error}")
+        return False
     
     # Step 3: Get project to verify images
     print("\n3. Verifying project with images...")
-    success, response, error = run_curl_command('GET', f'{base_url}/projects/{project_id}')
+    success, response, error = run_request('GET', f'{base_url}/projects/{project_id}')
     if success:
         try:
             data = json.loads(response)
@@ -140,11 +143,16 @@ def test_full_video_workflow():
     print("\n4. 🎬 CRITICAL TEST: Generating video with Ken Burns effects...")
     print("   (This may take 30-60 seconds...)")
     
-    success, response, error = run_curl_command('POST', f'{base_url}/projects/{project_id}/generate', timeout=90)
+    success, response, error = run_request('POST', f'{base_url}/projects/{project_id}/generate')
     
     if success:
         try:
-            data = json.loads(response)
+            json.loads(response)
+            # Generation runs in the background; wait for the project to leave "processing"
+            data = wait_for_generation(base_url, project_id)
+            if data is None:
+                print("❌ Timed out waiting for video generation")
+                return False
             video_url = data.get('video_url')
             if video_url:
                 print(f"✅ Video generated successfully!")
@@ -155,12 +163,12 @@ def test_full_video_workflow():
                 video_filename = video_url.split('/')[-1]
                 download_url = f'{base_url}/videos/{video_filename}'
                 
-                success, response, error = run_curl_command('GET', download_url, timeout=30)
-                if success and len(response) > 1000:  # Video should be reasonably sized
-                    print(f"✅ Video download successful ({len(response)} bytes)")
+                size = download_size(download_url)
+                if size > 1000:  # Video should be reasonably sized
+                    print(f"✅ Video download successful ({size} bytes)")
                     return True
                 else:
-                    print(f"❌ Video download failed or too small: {len(response) if success else 0} bytes")
+                    print(f"❌ Video download failed or too small: {size} bytes")
                     return False
             else:
                 print(f"❌ No video URL in response: {data}")
@@ -177,38 +185,51 @@ def test_full_video_workflow():
         print(f"❌ Video generation request failed: {error}")
         return False
 
-def test_error_scenarios():
-    """Test error handling scenarios"""
-    print("\n🛡️ Error Handling Tests")
-    print("=" * 30)
-    
-    base_url = "http://localhost:8001/api"
-    
-    # Test 1: Invalid project ID
-    print("1. Testing invalid project ID...")
-    success, response, error = run_curl_command('GET', f'{base_url}/projects/invalid-id')
+def check_invalid_project_id(base_url):
+    """Error case: unknown project ID should return 404"""
+    lines = ["1. Testing invalid project ID..."]
+    success, response, error = run_request('GET', f'{base_url}/projects/invalid-id')
     if not success or "404" in response or "not found" in response.lower():
-        print("✅ Correctly handled invalid project ID")
+        lines.append("✅ Correctly handled invalid project ID")
     else:
-        print(f"❌ Should have returned 404: {response}")
-    
-    # Test 2: Generate video without images
-    print("\n2. Testing video generation without images...")
+        lines.append(f"❌ Should have returned 404: {response}")
+    return lines
+
+def check_generate_without_images(base_url):
+    """Error case: generating a project without images should be rejected"""
+    lines = ["\n2. Testing video generation without images..."]
     project_data = json.dumps({"name": "Empty Project", "duration": 30})
-    success, response, error = run_curl_command('POST', f'{base_url}/projects', data=project_data)
+    success, response, error = run_request('POST', f'{base_url}/projects', data=project_data)
     
     if success:
         try:
             data = json.loads(response)
             empty_project_id = data.get('id')
             if empty_project_id:
-                success, response, error = run_curl_command('POST', f'{base_url}/projects/{empty_project_id}/generate')
+                success, response, error = run_request('POST', f'{base_url}/projects/{empty_project_id}/generate')
                 if not success or "No images" in response or "400" in response:
-                    print("✅ Correctly rejected video generation without images")
+                    lines.append("✅ Correctly rejected video generation without images")
                 else:
-                    print(f"❌ Should have rejected empty project: {response}")
+                    lines.append(f"❌ Should have rejected empty project: {response}")
         except:
-            print("❌ Failed to parse empty project response")
+            lines.append("❌ Failed to parse empty project response")
+    return lines
+
+def test_error_scenarios():
+    """Test error handling scenarios"""
+    print("\n🛡️ Error Handling Tests")
+    print("=" * 30)
+    
+    base_url = "http://localhost:8001/api"
+    
+    # The scenarios are independent, so overlap their round trips and print in order afterwards
+    checks = [check_invalid_project_id, check_generate_without_images]
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        results = list(executor.map(lambda check: check(base_url), checks))
+    
+    for lines in results:
+        for line in lines:
+            print(line)
     
     return True
 
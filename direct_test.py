@@ -9,42 +9,88 @@ sys.path.append('/app/backend')
 
 # Import the FastAPI app directly
 from server import app, db, VideoProject, VideoProjectCreate
-from fastapi.testclient import TestClient
+import httpx
 import asyncio
-import json
+import orjson
 import base64
-from PIL import Image
-import io
+import uuid
+from collections import namedtuple
+from functools import lru_cache
+import cv2
+import numpy as np
+
+@lru_cache(maxsize=32)
+def create_sample_image(width=800, height=600, color=(255, 0, 0)):
+    """Create a sample image for testing (cached per size and color)"""
+    # Fill the frame with one vectorized NumPy store; OpenCV works in BGR order
+    frame = np.full((height, width, 3), color[::-1], dtype=np.uint8)
+    # OpenCV's bundled libjpeg-turbo is the same codec the server decodes uploads with
+    _, encoded = cv2.imencode('.jpg', frame)
+    return encoded.tobytes()
+
+# Upload fixtures, encoded once at import so tests only pass byte references around
+RED_JPEG = create_sample_image(800, 600, (255, 0, 0))
+GREEN_JPEG = create_sample_image(800, 600, (0, 255, 0))
+BLUE_JPEG = create_sample_image(800, 600, (0, 0, 255))
+
+def failure_detail(response):
+    """Describe a failed response, decoding the already-read body to text only here"""
+    return f"HTTP {response.status_code}: {response.content.decode('utf-8', 'replace')}"
+
+TestResult = namedtuple('TestResult', 'test success message')
+
+MULTIPART_CHUNK_SIZE = 64 * 1024
+
+async def stream_multipart(files, boundary):
+    """Yield a multipart/form-data body in fixed-size chunks instead of building it in memory"""
+    for field, (filename, content, content_type) in files:
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        view = memoryview(content)
+        for start in range(0, len(view), MULTIPART_CHUNK_SIZE):
+            yield bytes(view[start:start + MULTIPART_CHUNK_SIZE])
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode()
 
 class DirectBackendTester:
-    def __init__(self):
-        self.client = TestClient(app)
+    def __init__(self, verbose=False):
+        self.client = None
         self.project_id = None
         self.test_results = []
+        # Output is buffered and written once at the end unless verbose
+        self.verbose = verbose
+        self._log = []
+    
+    def emit(self, line=""):
+        """Queue a line of output, or write it straight away in verbose mode"""
+        if self.verbose:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        else:
+            self._log.append(line)
+    
+    def flush_log(self):
+        """Write all buffered output in a single call"""
+        if self._log:
+            sys.stdout.write("\n".join(self._log) + "\n")
+            sys.stdout.flush()
+            self._log.clear()
         
     def log_test(self, test_name, success, message=""):
         """Log test results"""
         status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} {test_name}: {message}")
-        self.test_results.append({
-            "test": test_name,
-            "success": success,
-            "message": message
-        })
+        self.emit(f"{status} {test_name}: {message}")
+        self.test_results.append(TestResult(test_name, success, message))
         
-    def create_sample_image(self, width=800, height=600, color=(255, 0, 0)):
-        """Create a sample image for testing"""
-        img = Image.new('RGB', (width, height), color=color)
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG')
-        return buffer.getvalue()
-    
-    def test_api_health(self):
+    async def test_api_health(self):
         """Test 1: API Health Check"""
         try:
-            response = self.client.get("/api/")
+            response = await self.client.get("/api/")
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 self.log_test("API Health Check", True, f"API is running: {data.get('message', 'OK')}")
                 return True
             else:
@@ -54,7 +100,7 @@ class DirectBackendTester:
             self.log_test("API Health Check", False, f"Error: {str(e)}")
             return False
     
-    def test_create_project(self):
+    async def test_create_project(self):
         """Test 2: Project Creation"""
         try:
             project_data = {
@@ -64,10 +110,10 @@ class DirectBackendTester:
                 "resolution": "1080p"
             }
             
-            response = self.client.post("/api/projects", json=project_data)
+            response = await self.client.post("/api/projects", json=project_data)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 self.project_id = data.get("id")
                 if self.project_id:
                     self.log_test("Project Creation", True, f"Project created with ID: {self.project_id}")
@@ -76,56 +122,48 @@ class DirectBackendTester:
                     self.log_test("Project Creation", False, "No project ID returned")
                     return False
             else:
-                self.log_test("Project Creation", False, f"HTTP {response.status_code}: {response.text}")
+                self.log_test("Project Creation", False, failure_detail(response))
                 return False
                 
         except Exception as e:
             self.log_test("Project Creation", False, f"Error: {str(e)}")
             return False
     
-    def test_upload_images(self):
+    async def test_upload_images(self):
         """Test 3: Image Upload"""
-        if not self.project_id:
-            self.log_test("Image Upload", False, "No project ID available")
-            return False
-            
         try:
-            # Create sample images
-            image1 = self.create_sample_image(800, 600, (255, 0, 0))  # Red
-            image2 = self.create_sample_image(800, 600, (0, 255, 0))  # Green
-            image3 = self.create_sample_image(800, 600, (0, 0, 255))  # Blue
-            
             files = [
-                ('files', ('image1.jpg', image1, 'image/jpeg')),
-                ('files', ('image2.jpg', image2, 'image/jpeg')),
-                ('files', ('image3.jpg', image3, 'image/jpeg'))
+                ('files', ('image1.jpg', RED_JPEG, 'image/jpeg')),
+                ('files', ('image2.jpg', GREEN_JPEG, 'image/jpeg')),
+                ('files', ('image3.jpg', BLUE_JPEG, 'image/jpeg'))
             ]
             
-            response = self.client.post(f"/api/projects/{self.project_id}/upload-images", files=files)
+            boundary = uuid.uuid4().hex
+            response = await self.client.post(
+                f"/api/projects/{self.project_id}/upload-images",
+                content=stream_multipart(files, boundary),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            )
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 self.log_test("Image Upload", True, data.get("message", "Images uploaded"))
                 return True
             else:
-                self.log_test("Image Upload", False, f"HTTP {response.status_code}: {response.text}")
+                self.log_test("Image Upload", False, failure_detail(response))
                 return False
                 
         except Exception as e:
             self.log_test("Image Upload", False, f"Error: {str(e)}")
             return False
     
-    def test_get_project(self):
+    async def test_get_project(self):
         """Test 4: Get Project Details"""
-        if not self.project_id:
-            self.log_test("Get Project", False, "No project ID available")
-            return False
-            
         try:
-            response = self.client.get(f"/api/projects/{self.project_id}")
+            response = await self.client.get(f"/api/projects/{self.project_id}")
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data.get("id") == self.project_id:
                     images_count = len(data.get("images", []))
                     self.log_test("Get Project", True, f"Project retrieved with {images_count} images")
@@ -134,20 +172,20 @@ class DirectBackendTester:
                     self.log_test("Get Project", False, "Project ID mismatch")
                     return False
             else:
-                self.log_test("Get Project", False, f"HTTP {response.status_code}: {response.text}")
+                self.log_test("Get Project", False, failure_detail(response))
                 return False
                 
         except Exception as e:
             self.log_test("Get Project", False, f"Error: {str(e)}")
             return False
     
-    def test_get_all_projects(self):
+    async def test_get_all_projects(self):
         """Test 5: Get All Projects"""
         try:
-            response = self.client.get("/api/projects")
+            response = await self.client.get("/api/projects")
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if isinstance(data, list):
                     project_count = len(data)
                     self.log_test("Get All Projects", True, f"Retrieved {project_count} projects")
@@ -156,118 +194,126 @@ class DirectBackendTester:
                     self.log_test("Get All Projects", False, "Response is not a list")
                     return False
             else:
-                self.log_test("Get All Projects", False, f"HTTP {response.status_code}: {response.text}")
+                self.log_test("Get All Projects", False, failure_detail(response))
                 return False
                 
         except Exception as e:
             self.log_test("Get All Projects", False, f"Error: {str(e)}")
             return False
     
-    def test_video_generation_preparation(self):
+    async def test_video_generation_preparation(self):
         """Test 6: Video Generation Preparation (without actual FFmpeg)"""
-        if not self.project_id:
-            self.log_test("Video Generation Prep", False, "No project ID available")
-            return False
-            
         try:
-            # This will test the endpoint but may fail at FFmpeg execution
-            response = self.client.post(f"/api/projects/{self.project_id}/generate")
+            response = await self.client.post(f"/api/projects/{self.project_id}/generate")
             
-            # We expect this might fail due to FFmpeg, but we want to see if the endpoint works
-            if response.status_code in [200, 500]:  # 500 is acceptable if FFmpeg fails
-                if response.status_code == 200:
-                    data = response.json()
-                    self.log_test("Video Generation Prep", True, f"Video generation started: {data.get('message', 'OK')}")
-                    return True
-                else:
-                    # Check if it's an FFmpeg-related error
-                    error_text = response.text
-                    if "ffmpeg" in error_text.lower() or "video generation failed" in error_text.lower():
-                        self.log_test("Video Generation Prep", True, "Endpoint works, FFmpeg execution expected to fail in test environment")
-                        return True
-                    else:
-                        self.log_test("Video Generation Prep", False, f"Unexpected error: {error_text}")
-                        return False
+            # Generation is queued as a background task; FFmpeg failures only show up in the project status
+            if response.status_code == 202:
+                data = orjson.loads(response.content)
+                self.log_test("Video Generation Prep", True, f"Video generation started: {data.get('message', 'OK')}")
+                return True
             else:
-                self.log_test("Video Generation Prep", False, f"HTTP {response.status_code}: {response.text}")
+                self.log_test("Video Generation Prep", False, failure_detail(response))
                 return False
                 
         except Exception as e:
             self.log_test("Video Generation Prep", False, f"Error: {str(e)}")
             return False
     
-    def test_error_handling(self):
-        """Test 7: Error Handling"""
+    async def test_invalid_project_id(self):
+        """Test 7: Error Handling - Invalid project ID"""
         try:
-            # Test invalid project ID
-            response = self.client.get("/api/projects/invalid-id")
+            response = await self.client.get("/api/projects/invalid-id")
             if response.status_code == 404:
                 self.log_test("Error Handling - Invalid ID", True, "Correctly returned 404")
+                return True
             else:
                 self.log_test("Error Handling - Invalid ID", False, f"Expected 404, got {response.status_code}")
-            
-            # Test invalid file type
-            if self.project_id:
-                files = [('file', ('test.txt', b'invalid content', 'text/plain'))]
-                response = self.client.post(f"/api/projects/{self.project_id}/upload-logo", files=files)
-                if response.status_code == 400:
-                    self.log_test("Error Handling - Invalid File", True, "Correctly rejected invalid file")
-                else:
-                    self.log_test("Error Handling - Invalid File", False, f"Expected 400, got {response.status_code}")
-            
-            return True
+                return False
+                
+        except Exception as e:
+            self.log_test("Error Handling - Invalid ID", False, f"Error: {str(e)}")
+            return False
+    
+    async def test_invalid_file_type(self):
+        """Test 8: Error Handling - Invalid file type"""
+        try:
+            files = [('file', ('test.txt', b'invalid content', 'text/plain'))]
+            response = await self.client.post(f"/api/projects/{self.project_id}/upload-logo", files=files)
+            if response.status_code == 400:
+                self.log_test("Error Handling - Invalid File", True, "Correctly rejected invalid file")
+                return True
+            else:
+                self.log_test("Error Handling - Invalid File", False, f"Expected 400, got {response.status_code}")
+                return False
                 
         except Exception as e:
-            self.log_test("Error Handling", False, f"Error: {str(e)}")
+            self.log_test("Error Handling - Invalid File", False, f"Error: {str(e)}")
             return False
     
-    def run_all_tests(self):
+    async def run_all_tests(self):
         """Run all backend tests"""
-        print("🚀 Direct Backend API Tests for Video Generation App")
-        print("=" * 60)
-        
-        tests = [
-            self.test_api_health,
-            self.test_create_project,
-            self.test_upload_images,
-            self.test_get_project,
-            self.test_get_all_projects,
-            self.test_video_generation_preparation,
-            self.test_error_handling,
-        ]
+        self.emit("🚀 Direct Backend API Tests for Video Generation App")
+        self.emit("=" * 60)
         
-        for test_func in tests:
-            test_func()
-        
-        # Summary
-        self.print_summary()
+        # Buffered results are written even if the run is interrupted or a test escapes with an exception
+        try:
+            # One event loop and one in-process client for the whole run
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                self.client = client
+                
+                # Tests that don't need a project run concurrently
+                await asyncio.gather(
+                    self.test_api_health(),
+                    self.test_get_all_projects(),
+                    self.test_invalid_project_id(),
+                )
+                
+                # The rest depend on the project created here, in order; without it there is nothing to run
+                dependent = [
+                    self.test_upload_images,
+                    self.test_get_project,
+                    self.test_video_generation_preparation,
+                    self.test_invalid_file_type,
+                ]
+                
+                if await self.test_create_project():
+                    for test_func in dependent:
+                        await test_func()
+                else:
+                    self.emit(f"⏭️ Skipping {len(dependent)} project-dependent tests")
+            
+            # Summary
+            return self.print_summary()
+        finally:
+            self.flush_log()
     
     def print_summary(self):
         """Print test summary"""
-        print("\n" + "=" * 60)
-        print("📊 TEST SUMMARY")
-        print("=" * 60)
+        self.emit("\n" + "=" * 60)
+        self.emit("📊 TEST SUMMARY")
+        self.emit("=" * 60)
         
-        passed = sum(1 for result in self.test_results if result["success"])
+        passed = sum(1 for result in self.test_results if result.success)
         total = len(self.test_results)
         
-        print(f"Total Tests: {total}")
-        print(f"Passed: {passed}")
-        print(f"Failed: {total - passed}")
-        print(f"Success Rate: {(passed/total)*100:.1f}%")
+        self.emit(f"Total Tests: {total}")
+        self.emit(f"Passed: {passed}")
+        self.emit(f"Failed: {total - passed}")
+        self.emit(f"Success Rate: {(passed/total)*100:.1f}%")
         
         # Show failed tests
-        failed_tests = [result for result in self.test_results if not result["success"]]
+        failed_tests = [result for result in self.test_results if not result.success]
         if failed_tests:
-            print("\n❌ FAILED TESTS:")
+            self.emit("\n❌ FAILED TESTS:")
             for test in failed_tests:
-                print(f"  - {test['test']}: {test['message']}")
+                self.emit(f"  - {test.test}: {test.message}")
         
         return passed >= (total * 0.8)  # 80% pass rate acceptable
 
 if __name__ == "__main__":
-    tester = DirectBackendTester()
-    success = tester.run_all_tests()
+    tester = DirectBackendTester(verbose="--verbose" in sys.argv)
+    success = asyncio.run(tester.run_all_tests())
     
     if success:
         print("\n🎉 Backend tests mostly passed! Core functionality is working.")
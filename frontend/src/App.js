@@ -124,7 +124,18 @@ const VideoGenerator = () => {
       setLoading(true);
       await axios.post(`${API}/projects/${currentProject.id}/generate`);
       
-      // Refresh project data
+      // Generation runs in the background; poll until the project leaves "processing", giving up after 10 minutes.
+      // A failed poll request throws and ends the loop through the catch below.
+      // The status endpoint leaves out the images and logo, so each poll stays small.
+      const pollDeadline = Date.now() + 10 * 60 * 1000;
+      let status = await axios.get(`${API}/projects/${currentProject.id}/status`);
+      while (status.data.status === 'processing' && Date.now() < pollDeadline) {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        status = await axios.get(`${API}/projects/${currentProject.id}/status`);
+      }
+      if (status.data.status === 'processing') {
+        console.error('Video generation is still running; refresh the project later to check on it');
+      }
       const response = await axios.get(`${API}/projects/${currentProject.id}`);
       setCurrentProject(response.data);
       fetchProjects();
@@ -316,7 +327,7 @@ const VideoGenerator = () => {
             onChange={(e) => e.target.files[0] && uploadMusic(e.target.files[0])}
             className="block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded-md file:border-0 file:text-sm file:font-semibold file:bg-blue-50 file:text-blue-700 hover:file:bg-blue-100"
           />
-          {currentProject?.music_file && (
+          {(currentProject?.music_file_id || currentProject?.music_file) && (
             <p className="mt-2 text-green-600">✓ Music uploaded</p>
           )}
         </div>
@@ -382,12 +393,16 @@ const VideoGenerator = () => {
             
             <div className="flex gap-2">
               <button
-                onClick={() => {
-                  setCurrentProject(project);
-                  setActiveTab('edit');
-                  if (project.images) {
-                    const previews = project.images.map(img => `data:image/jpeg;base64,${img}`);
+                onClick={async () => {
+                  // The project list omits file contents, so load the full project for editing
+                  try {
+                    const response = await axios.get(`${API}/projects/${project.id}`);
+                    setCurrentProject(response.data);
+                    setActiveTab('edit');
+                    const previews = response.data.images.map(img => `data:image/jpeg;base64,${img}`);
                     setUploadedImages(previews);
+                  } catch (error) {
+                    console.error('Error loading project:', error);
                   }
                 }}
                 className="bg-blue-600 text-white px-3 py-1 rounded text-sm hover:bg-blue-700 transition-colors"
@@ -0,0 +1,41 @@
+import struct
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from server import PNG_SIGNATURE, read_image_size
+
+def png_header(width, height):
+    return PNG_SIGNATURE + b'\x00\x00\x00\x0dIHDR' + struct.pack('>II', width, height) + b'\x08\x02\x00\x00\x00'
+
+def jpeg_header(width, height):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + sof0
+
+def test_png_size():
+    assert read_image_size(png_header(640, 480)) == (640, 480)
+
+def test_jpeg_size():
+    assert read_image_size(jpeg_header(3000, 2000)) == (3000, 2000)
+
+def test_truncated_png_header():
+    # Signature and IHDR tag present, but the width/height fields are cut short
+    assert read_image_size(PNG_SIGNATURE + b'\x00\x00\x00\x0dIHDR' + b'\x00\x01') is None
+
+def test_truncated_jpeg_header():
+    data = jpeg_header(3000, 2000)
+    # Cut anywhere before the SOF width field ends, there is no size to read
+    size_end = data.index(b'\xff\xc0') + 9
+    for end in range(size_end):
+        assert read_image_size(data[:end]) is None
+    assert read_image_size(data[:size_end]) == (3000, 2000)
+
+def test_malformed_headers():
+    assert read_image_size(b'') is None
+    assert read_image_size(b'not an image at all') is None
+    # A segment that isn't introduced by 0xFF
+    assert read_image_size(b'\xff\xd8\x00\x00' + b'\x00' * 16) is None
+    # A segment length that runs past the end of the data
+    assert read_image_size(b'\xff\xd8\xff\xe0\xff\xff' + b'\x00' * 16) is None